@@ -1,108 +1,387 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request
+import orjson
+import polyline
 import os
+import asyncio
+import aiohttp
 import requests
-import math
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+import diskcache
+import numpy as np
+from heapq import heappush, heappop
 from typing import List, Dict, Tuple, Set
 
+# Numba is optional; without it the NumPy implementations are used
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
 app = Flask(__name__)
-app.config['JSONIFY_PRETTYPRINT_REGULAR'] = True
 
 # OSRM API configuration
 OSRM_API_URL = "http://router.project-osrm.org"  # Public OSRM instance
+OSRM_PROFILE = "driving"
+# Set to "0" to use straight-line (Haversine) distances for the distance matrix
+USE_OSRM_DISTANCES = os.environ.get("USE_OSRM_DISTANCES", "1") != "0"
+# Maximum number of concurrent OSRM requests per route
+OSRM_MAX_WORKERS = 16
+# Maximum number of in-flight async OSRM requests when building a distance matrix pair by pair
+OSRM_MAX_ASYNC_REQUESTS = 32
+# Largest input fetched pair by pair when OSRM rejects the /table request.
+# This is well under OSRM's default table limit (100 coordinates), so the
+# pairwise path handles per-point rejections such as NoSegment or
+# InvalidQuery, not TooBig
+OSRM_MAX_PAIRWISE_STOPS = 25
+# Minimal /route parameters for distance-only lookups
+OSRM_DISTANCE_PARAMS = {
+    "overview": "false",
+    "alternatives": "false",
+    "steps": "false",
+    "annotations": "false",
+    "skip_waypoints": "true"
+}
+
+# Shared HTTP session so OSRM requests reuse keep-alive connections
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=32, pool_maxsize=32))
+SESSION.mount("https://", HTTPAdapter(pool_connections=32, pool_maxsize=32))
+
+# Routes with at most this many stops are refined with 2-opt
+TWO_OPT_MAX_STOPS = 50
+
+# Decimal places used to normalize coordinates for OSRM response caching
+COORD_PRECISION = 5
 
+# Persistent OSRM response cache shared across restarts and workers
+OSRM_CACHE_DIR = os.environ.get("OSRM_CACHE_DIR", "/tmp/osrm_cache")
+OSRM_CACHE_TTL = 3600  # Seconds
+CACHE = diskcache.Cache(OSRM_CACHE_DIR)
+
+
+if HAS_NUMBA:
+    # Serial on purpose: N is small, and Numba's parallel threading layers are
+    # neither fork-safe nor safe under gunicorn's threaded workers
+    @njit(fastmath=True, cache=True)
+    def _haversine_matrix_jit(lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+        """Compiled pairwise Haversine kernel over latitudes/longitudes in radians."""
+        R = 6371.0  # Earth's radius in kilometers
+        n = lats.shape[0]
+        D = np.zeros((n, n), dtype=np.float32)
+        # cos(lat) once per coordinate instead of once per pair
+        cos_lats = np.cos(lats)
+        for i in range(n):
+            lat_i = lats[i]
+            lon_i = lons[i]
+            cos_i = cos_lats[i]
+            for j in range(i + 1, n):
+                a = (np.sin((lats[j] - lat_i) / 2) ** 2 +
+                     cos_i * cos_lats[j] *
+                     np.sin((lons[j] - lon_i) / 2) ** 2)
+                d = np.float32(2 * R * np.arcsin(np.sqrt(a)))
+                D[i, j] = d
+                D[j, i] = d  # Symmetric matrix
+        return D
+    
+    @njit(cache=True)
+    def _prim_mst_jit(W: np.ndarray) -> np.ndarray:
+        """Compiled array-based Prim kernel; returns MST edges as an (n-1) x 2 array."""
+        n = W.shape[0]
+        key = np.full(n, np.inf)
+        parent = np.full(n, -1, dtype=np.int64)
+        in_mst = np.zeros(n, dtype=np.bool_)
+        edges = np.empty((max(n - 1, 0), 2), dtype=np.int64)
+        count = 0
+        key[0] = 0.0
+        
+        for _ in range(n):
+            # Closest vertex not yet in the tree
+            u = -1
+            best = np.inf
+            for v in range(n):
+                if not in_mst[v] and key[v] < best:
+                    best = key[v]
+                    u = v
+            if u == -1:
+                break
+            
+            in_mst[u] = True
+            if parent[u] != -1:
+                edges[count, 0] = parent[u]
+                edges[count, 1] = u
+                count += 1
+            
+            for v in range(n):
+                if not in_mst[v] and W[u, v] < key[v]:
+                    key[v] = W[u, v]
+                    parent[v] = u
+        
+        return edges[:count]
 
-def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+
+def haversine_matrix(coords: List[List[float]]) -> np.ndarray:
     """
-    Calculate the great circle distance between two points on Earth using Haversine formula.
-    Returns distance in kilometers.
+    Vectorized Haversine distance between all pairs of coordinates.
+    Returns a symmetric N x N float32 array of distances in kilometers.
     """
     R = 6371  # Earth's radius in kilometers
     
-    dlat = math.radians(lat2 - lat1)
-    dlon = math.radians(lon2 - lon1)
+    points = np.radians(np.asarray(coords, dtype=np.float32).reshape(-1, 2))
+    lats = np.ascontiguousarray(points[:, 0])
+    lons = np.ascontiguousarray(points[:, 1])
+    
+    if HAS_NUMBA:
+        return _haversine_matrix_jit(lats, lons)
+    
+    # Only compute the upper triangle, then mirror it
+    n = len(lats)
+    iu = np.triu_indices(n, k=1)
+    # cos(lat) once per coordinate instead of once per pair
+    cos_lats = np.cos(lats)
+    
+    a = (np.sin((lats[iu[1]] - lats[iu[0]]) / 2) ** 2 +
+         cos_lats[iu[0]] * cos_lats[iu[1]] *
+         np.sin((lons[iu[1]] - lons[iu[0]]) / 2) ** 2)
+    d = 2 * R * np.arcsin(np.sqrt(a))
     
-    a = (math.sin(dlat / 2) ** 2 + 
-         math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * 
-         math.sin(dlon / 2) ** 2)
+    matrix = np.zeros((n, n), dtype=np.float32)
+    matrix[iu] = d
+    matrix.T[iu] = d  # Symmetric matrix
+    return matrix
+
+
+class OSRMError(Exception):
+    """OSRM answered but rejected the request (e.g. code "NoSegment" or "TooBig")."""
     
-    c = 2 * math.asin(math.sqrt(a))
-    return R * c
+    def __init__(self, code: str, message: str = ""):
+        super().__init__(f"{code}: {message}" if message else code)
+        self.code = code
 
 
-def get_distance_osrm(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+def _coord_key(lat: float, lon: float) -> Tuple[float, float]:
+    """Normalize a coordinate into a hashable cache key."""
+    return (round(lat, COORD_PRECISION), round(lon, COORD_PRECISION))
+
+
+def _cache_key(kind: str, p1: Tuple[float, float], p2: Tuple[float, float]) -> Tuple:
+    """Disk cache key for an OSRM lookup between two normalized points."""
+    return (kind, OSRM_PROFILE, *p1, *p2)
+
+
+def _route_url(p1: Tuple[float, float], p2: Tuple[float, float]) -> str:
+    """OSRM /route URL between two (lat, lon) points."""
+    lat1, lon1 = p1
+    lat2, lon2 = p2
+    # OSRM API expects [lon, lat] format
+    return f"{OSRM_API_URL}/route/v1/{OSRM_PROFILE}/{lon1},{lat1};{lon2},{lat2}"
+
+
+def _first_route(data: Dict) -> Dict:
+    """Return the first route of an OSRM /route response, raising if there is none."""
+    if data.get("code") != "Ok" or len(data.get("routes", [])) == 0:
+        raise ValueError(f"OSRM returned no route: {data.get('code')}")
+    return data["routes"][0]
+
+
+def _route_distance(data: Dict) -> float:
+    """Distance in kilometers from an OSRM /route response."""
+    # Distance in meters
+    return _first_route(data)["distance"] / 1000  # Convert to km
+
+
+def _disk_cached(kind: str):
     """
-    Get distance between two points using OSRM API.
-    Falls back to Haversine if OSRM fails.
+    Decorator caching an OSRM fetch keyed by _cache_key(kind, p1, p2)
+    in the persistent disk cache. Exceptions propagate and are not cached.
     """
-    try:
-        # OSRM API expects [lon, lat] format
-        response = requests.get(
-            f"{OSRM_API_URL}/route/v1/driving/{lon1},{lat1};{lon2},{lat2}",
-            params={"overview": "false"},
-            timeout=5
-        )
-        
-        if response.status_code == 200:
-            data = response.json()
-            if data.get("code") == "Ok" and len(data.get("routes", [])) > 0:
-                # Distance in meters
-                return data["routes"][0]["distance"] / 1000  # Convert to km
-    except Exception as e:
-        print(f"OSRM API error: {e}")
-    
-    # Fallback to Haversine
-    return haversine_distance(lat1, lon1, lat2, lon2)
+    def decorator(func):
+        @wraps(func)
+        def wrapper(p1: Tuple[float, float], p2: Tuple[float, float]):
+            key = _cache_key(kind, p1, p2)
+            value = CACHE.get(key)
+            if value is None:
+                value = func(p1, p2)
+                CACHE.set(key, value, expire=OSRM_CACHE_TTL)
+            return value
+        return wrapper
+    return decorator
 
 
-def get_route_geometry_osrm(lat1: float, lon1: float, lat2: float, lon2: float) -> List[List[float]]:
+async def _fetch_distance_osrm_async(
+    session: aiohttp.ClientSession,
+    sem: asyncio.Semaphore,
+    p1: Tuple[float, float],
+    p2: Tuple[float, float]
+) -> float:
+    """
+    Fetch road distance in kilometers between two (lat, lon) points from OSRM.
+    Does not touch the disk cache, which callers consult outside the event loop.
+    Raises on failure.
+    """
+    async with sem:
+        async with session.get(_route_url(p1, p2), params=OSRM_DISTANCE_PARAMS) as response:
+            response.raise_for_status()
+            data = await response.json()
+    return _route_distance(data)
+
+
+@_disk_cached("geometry")
+def _fetch_route_geometry_osrm(p1: Tuple[float, float], p2: Tuple[float, float]) -> np.ndarray:
+    """
+    Fetch route geometry between two (lat, lon) points from OSRM as an (n, 2) float64 array.
+    Raises on failure so that errors are never cached.
+    """
+    response = SESSION.get(
+        _route_url(p1, p2),
+        params={"overview": "full", "geometries": "polyline6"},
+        timeout=5
+    )
+    response.raise_for_status()
+    
+    # Geometry is an encoded polyline with 6-digit precision, decoded as [lat, lon]
+    geometry = polyline.decode(_first_route(response.json())["geometry"], 6)
+    # float64 keeps polyline6's 1e-6 degree precision at every longitude
+    return np.asarray(geometry, dtype=np.float64).reshape(-1, 2)
+
+
+def get_route_geometry_osrm(lat1: float, lon1: float, lat2: float, lon2: float) -> np.ndarray:
     """
     Get detailed route geometry between two points using OSRM API.
+    Results are cached per ordered coordinate pair.
     Falls back to straight line if OSRM fails.
     
     Returns:
-        List of [lat, lon] coordinates representing the route
+        (n, 2) float64 array of [lat, lon] coordinates representing the route
     """
     try:
-        # OSRM API expects [lon, lat] format
-        response = requests.get(
-            f"{OSRM_API_URL}/route/v1/driving/{lon1},{lat1};{lon2},{lat2}",
-            params={"overview": "full", "geometries": "geojson"},
-            timeout=5
-        )
-        
-        if response.status_code == 200:
-            data = response.json()
-            if data.get("code") == "Ok" and len(data.get("routes", [])) > 0:
-                # Get geometry coordinates in GeoJSON format [lon, lat]
-                geometry = data["routes"][0]["geometry"]["coordinates"]
-                # Convert to [lat, lon] format
-                return [[coord[1], coord[0]] for coord in geometry]
+        return _fetch_route_geometry_osrm(_coord_key(lat1, lon1), _coord_key(lat2, lon2))
     except Exception as e:
         print(f"OSRM route geometry error: {e}")
     
     # Fallback to straight line
-    return [[lat1, lon1], [lat2, lon2]]
+    return np.array([[lat1, lon1], [lat2, lon2]], dtype=np.float64)
 
 
-def build_distance_matrix(coords: List[List[float]]) -> List[List[float]]:
+def get_distance_matrix_osrm(coords: List[List[float]]) -> np.ndarray:
     """
-    Build a distance matrix between all pairs of coordinates.
-    Returns a 2D list where matrix[i][j] = distance between coord i and coord j.
+    Get the full road distance matrix in kilometers with a single OSRM /table request.
+    Unroutable pairs fall back to Haversine.
+    Raises OSRMError if OSRM rejects the query, or another exception if the request fails.
+    """
+    # OSRM API expects [lon, lat] format
+    joined = ";".join(f"{lon},{lat}" for lat, lon in coords)
+    response = SESSION.get(
+        f"{OSRM_API_URL}/table/v1/{OSRM_PROFILE}/{joined}",
+        params={"annotations": "distance", "skip_waypoints": "true"},
+        timeout=10
+    )
+    if response.status_code == 400:
+        # OSRM rejects invalid or oversized queries with a JSON error body
+        data = response.json()
+        raise OSRMError(data.get("code"), data.get("message", ""))
+    response.raise_for_status()
+    
+    data = response.json()
+    if data.get("code") != "Ok":
+        raise OSRMError(data.get("code"), data.get("message", ""))
+    if "distances" not in data:
+        raise ValueError("OSRM returned no distance table")
+    
+    # Distances in meters, null where no route exists
+    matrix = np.array(data["distances"], dtype=np.float32) / 1000  # Convert to km
+    missing = np.isnan(matrix)
+    if missing.any():
+        matrix[missing] = haversine_matrix(coords)[missing]
+    
+    # Mirror the upper triangle to keep the matrix symmetric
+    upper = np.triu(matrix, k=1)
+    return upper + upper.T
+
+
+def get_distance_matrix_pairs_osrm(coords: List[List[float]]) -> np.ndarray:
+    """
+    Get the road distance matrix in kilometers from concurrent per-pair OSRM /route requests.
+    Used when OSRM rejects the /table request for a small input, e.g. because one point
+    cannot be snapped to a road. Pairs that fail fall back to Haversine.
     """
     n = len(coords)
-    matrix = [[0.0 for _ in range(n)] for _ in range(n)]
+    keys = [_coord_key(lat, lon) for lat, lon in coords]
+    matrix = haversine_matrix(coords)
     
+    # Serve cached pairs first so the event loop never blocks on SQLite
+    pending = []
     for i in range(n):
         for j in range(i + 1, n):
-            lat1, lon1 = coords[i]
-            lat2, lon2 = coords[j]
-            distance = get_distance_osrm(lat1, lon1, lat2, lon2)
-            matrix[i][j] = distance
-            matrix[j][i] = distance  # Symmetric matrix
-    
+            # Sort endpoints so (a, b) and (b, a) share a cache entry
+            p1, p2 = sorted((keys[i], keys[j]))
+            distance = CACHE.get(_cache_key("distance", p1, p2))
+            if distance is None:
+                pending.append((i, j, p1, p2))
+            else:
+                matrix[i][j] = distance
+                matrix[j][i] = distance  # Symmetric matrix
+    
+    async def gather_distances():
+        sem = asyncio.Semaphore(OSRM_MAX_ASYNC_REQUESTS)
+        timeout = aiohttp.ClientTimeout(total=5)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            return await asyncio.gather(
+                *(_fetch_distance_osrm_async(session, sem, p1, p2) for _, _, p1, p2 in pending),
+                return_exceptions=True
+            )
+    
+    results = asyncio.run(gather_distances()) if pending else []
+    
+    failed = 0
+    for (i, j, p1, p2), distance in zip(pending, results):
+        if isinstance(distance, Exception):
+            failed += 1
+            continue
+        CACHE.set(_cache_key("distance", p1, p2), distance, expire=OSRM_CACHE_TTL)
+        matrix[i][j] = distance
+        matrix[j][i] = distance  # Symmetric matrix
+    
+    if failed:
+        print(f"OSRM API error for {failed} of {n * (n - 1) // 2} pairs, using Haversine for them")
     return matrix
 
 
+def build_distance_matrix(coords: List[List[float]], use_osrm: bool = USE_OSRM_DISTANCES) -> np.ndarray:
+    """
+    Build a distance matrix between all pairs of coordinates.
+    Returns an N x N array where matrix[i][j] = distance between coord i and coord j.
+    Uses road distances from OSRM, or straight-line distances when use_osrm is False
+    or OSRM is unreachable.
+    """
+    if use_osrm:
+        rejected = False
+        try:
+            return get_distance_matrix_osrm(coords)
+        except OSRMError as e:
+            print(f"OSRM table rejected: {e}")
+            rejected = True
+        except Exception as e:
+            # Transport errors mean OSRM is unreachable; retrying N^2 times won't help
+            print(f"OSRM table error: {e}")
+        
+        # OSRM is up but refused the table, typically over a single bad point;
+        # small inputs can still be fetched pair by pair
+        if rejected and len(coords) <= OSRM_MAX_PAIRWISE_STOPS:
+            try:
+                return get_distance_matrix_pairs_osrm(coords)
+            except Exception as e:
+                print(f"OSRM API error: {e}")
+        elif rejected:
+            print(f"Skipping pairwise OSRM lookups for {len(coords)} stops "
+                  f"(limit {OSRM_MAX_PAIRWISE_STOPS}), using Haversine")
+    
+    # Fallback to Haversine
+    return haversine_matrix(coords)
+
+
 class Graph:
     """Adjacency list representation of a graph."""
     
@@ -129,28 +408,25 @@ def dijkstra(graph: Graph, start: int, end: int) -> Tuple[List[int], float]:
     previous = [None] * graph.num_vertices
     visited = set()
     distances[start] = 0
+    heap = [(0, start)]
     
-    while len(visited) < graph.num_vertices:
-        # Find unvisited vertex with minimum distance
-        u = None
-        min_dist = float('inf')
-        for i in range(graph.num_vertices):
-            if i not in visited and distances[i] < min_dist:
-                min_dist = distances[i]
-                u = i
+    while heap:
+        # Pop closest vertex, skipping stale heap entries
+        d, u = heappop(heap)
+        if u in visited:
+            continue
+        visited.add(u)
         
-        if u is None or u == end:
+        if u == end:
             break
         
-        visited.add(u)
-        
         # Update distances to neighbors
         for v, weight in graph.get_neighbors(u):
-            if v not in visited:
-                alt = distances[u] + weight
-                if alt < distances[v]:
-                    distances[v] = alt
-                    previous[v] = u
+            alt = d + weight
+            if alt < distances[v]:
+                distances[v] = alt
+                previous[v] = u
+                heappush(heap, (alt, v))
     
     # Reconstruct path
     path = []
@@ -162,34 +438,106 @@ def dijkstra(graph: Graph, start: int, end: int) -> Tuple[List[int], float]:
     return path, distances[end]
 
 
+def dijkstra_dense(W: np.ndarray, start: int, end: int) -> Tuple[List[int], float]:
+    """
+    Classical O(V^2) array-based Dijkstra's algorithm on a dense distance matrix.
+    Takes the matrix directly, so no graph needs to be built.
+    Returns (path, distance).
+    """
+    n = W.shape[0]
+    distances = np.full(n, np.inf)
+    previous = np.full(n, -1)
+    visited = np.zeros(n, dtype=bool)
+    distances[start] = 0
+    
+    for _ in range(n):
+        # Closest unvisited vertex
+        u = int(np.argmin(np.where(visited, np.inf, distances)))
+        if np.isinf(distances[u]):
+            break
+        
+        visited[u] = True
+        if u == end:
+            break
+        
+        # Relax all edges out of u at once
+        alt = distances[u] + W[u]
+        closer = ~visited & (alt < distances)
+        distances[closer] = alt[closer]
+        previous[closer] = u
+    
+    # Reconstruct path
+    path = []
+    u = end
+    while u != -1:
+        path.insert(0, u)
+        u = int(previous[u])
+    
+    return path, float(distances[end])
+
+
 def prim_mst(graph: Graph) -> List[Tuple[int, int]]:
     """
     Prim's algorithm to find Minimum Spanning Tree.
     Returns list of edges in the MST.
     """
     n = graph.num_vertices
-    visited = set()
+    in_mst = [False] * n
     mst_edges = []
     
-    # Start with vertex 0
-    visited.add(0)
+    # Heap of candidate cut edges (weight, vertex, parent), starting at vertex 0
+    heap = [(0, 0, -1)]
     
-    while len(visited) < n:
-        min_edge = None
-        min_weight = float('inf')
+    while heap:
+        # Stale entries for vertices already in the tree are skipped lazily
+        _, v, u = heappop(heap)
+        if in_mst[v]:
+            continue
         
-        # Find minimum edge connecting visited to unvisited
-        for u in visited:
-            for v, weight in graph.get_neighbors(u):
-                if v not in visited and weight < min_weight:
-                    min_weight = weight
-                    min_edge = (u, v)
+        in_mst[v] = True
+        if u != -1:
+            mst_edges.append((u, v))
         
-        if min_edge is None:
+        for x, weight in graph.get_neighbors(v):
+            if not in_mst[x]:
+                heappush(heap, (weight, x, v))
+    
+    return mst_edges
+
+
+def prim_mst_dense(W: np.ndarray) -> List[Tuple[int, int]]:
+    """
+    Classical O(V^2) array-based Prim's algorithm on a dense distance matrix.
+    Takes the matrix directly, so no graph needs to be built.
+    Returns list of edges in the MST.
+    """
+    if HAS_NUMBA:
+        edges = _prim_mst_jit(np.ascontiguousarray(W))
+        return [(int(u), int(v)) for u, v in edges]
+    
+    n = W.shape[0]
+    key = np.full(n, np.inf)
+    parent = np.full(n, -1)
+    in_mst = np.zeros(n, dtype=bool)
+    mst_edges = []
+    
+    # Start with vertex 0
+    key[0] = 0
+    
+    for _ in range(n):
+        # Closest vertex not yet in the tree
+        u = int(np.argmin(np.where(in_mst, np.inf, key)))
+        if np.isinf(key[u]):
             break
         
-        mst_edges.append(min_edge)
-        visited.add(min_edge[1])
+        in_mst[u] = True
+        if parent[u] != -1:
+            mst_edges.append((int(parent[u]), u))
+        
+        # Relax all edges out of u at once
+        closer = ~in_mst & (W[u] < key)
+        key[closer] = W[u][closer]
+        parent[closer] = u
     
     return mst_edges
 
@@ -200,7 +548,8 @@ def dfs_traversal(mst_edges: List[Tuple[int, int]], start: int) -> List[int]:
     Returns list of vertices in DFS order.
     """
     # Build adjacency list from MST edges
-    adj = {i: [] for i in range(len(mst_edges) + 1)}
+    num_vertices = max([start] + [max(u, v) for u, v in mst_edges]) + 1
+    adj = {i: [] for i in range(num_vertices)}
     for u, v in mst_edges:
         adj[u].append(v)
         adj[v].append(u)
@@ -208,32 +557,110 @@ def dfs_traversal(mst_edges: List[Tuple[int, int]], start: int) -> List[int]:
     visited = set()
     traversal_order = []
     
-    def dfs(u: int):
+    # Explicit stack instead of recursion; neighbors are pushed in
+    # reverse so they are visited in the same order as recursive DFS
+    stack = [start]
+    while stack:
+        u = stack.pop()
         if u in visited:
-            return
+            continue
         visited.add(u)
         traversal_order.append(u)
-        for v in adj[u]:
-            dfs(v)
+        stack.extend(reversed(adj[u]))
     
-    dfs(start)
     return traversal_order
 
 
+def _two_opt_kernel(order: np.ndarray, D: np.ndarray) -> np.ndarray:
+    """2-opt passes over an open path in place, keeping order[0] fixed."""
+    n = order.shape[0]
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, n - 1):
+            for j in range(i + 1, n):
+                # Change in length from reversing order[i..j]
+                a = order[i - 1]
+                b = order[i]
+                c = order[j]
+                delta = D[a, c] - D[a, b]
+                if j < n - 1:
+                    d = order[j + 1]
+                    delta += D[b, d] - D[c, d]
+                
+                if delta < -1e-6:
+                    order[i:j + 1] = order[i:j + 1][::-1].copy()
+                    improved = True
+    return order
+
+
+if HAS_NUMBA:
+    _two_opt_kernel = njit(cache=True)(_two_opt_kernel)
+
+
+def two_opt(visiting_order: List[int], distance_matrix: np.ndarray) -> List[int]:
+    """
+    Shorten a visiting order with 2-opt segment reversals on the distance matrix.
+    The start vertex stays first; the route is an open path with no return leg.
+    Returns the improved visiting order.
+    """
+    if len(visiting_order) < 3:
+        return visiting_order
+    
+    order = np.array(visiting_order, dtype=np.int64)
+    D = np.ascontiguousarray(distance_matrix)
+    return [int(v) for v in _two_opt_kernel(order, D)]
+
+
+def dedupe_coords(coords: List[List[float]]) -> Tuple[List[List[float]], List[List[int]]]:
+    """
+    Validate coordinates and drop duplicates that round to the same key, keeping the first occurrence.
+    
+    Returns:
+        (unique_coords, groups) where groups[k] lists the input indices merged into unique_coords[k]
+    """
+    seen = {}
+    unique_coords = []
+    groups = []
+    
+    for i, coord in enumerate(coords):
+        # Require a [lat, lon] pair of real numbers before converting anything
+        if (not isinstance(coord, (list, tuple)) or len(coord) != 2 or
+                not all(isinstance(x, (int, float)) and not isinstance(x, bool) for x in coord)):
+            raise ValueError(f"Invalid coordinate at index {i}: {coord!r}")
+        
+        lat, lon = float(coord[0]), float(coord[1])
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            raise ValueError(f"Invalid coordinate at index {i}: {coord!r}")
+        
+        key = _coord_key(lat, lon)
+        if key not in seen:
+            seen[key] = len(unique_coords)
+            unique_coords.append([lat, lon])
+            groups.append([])
+        groups[seen[key]].append(i)
+    
+    return unique_coords, groups
+
+
 def plan_route(coords: List[List[float]]) -> Dict:
     """
-    Main route planning function using Dijkstra, Prim, and DFS.
+    Main route planning function using Prim, DFS, and 2-opt.
     
     Args:
         coords: List of [lat, lon] pairs
     
     Returns:
-        Dictionary with visiting order, route coordinates, and total distance
+        Dictionary with visiting order, route coordinates, and total distance.
+        Route coordinates and road segments are float64 NumPy arrays.
     """
+    # Coordinates arrive as JSON lists; convert once for array indexing
+    pts = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    
     if len(coords) < 2:
         return {
             "visiting_order": [0],
-            "route_coords": [coords[0]],
+            "route_coords": pts[:1],
             "total_distance": 0,
             "road_segments": []
         }
@@ -242,49 +669,37 @@ def plan_route(coords: List[List[float]]) -> Dict:
     print("Building distance matrix...")
     distance_matrix = build_distance_matrix(coords)
     
-    # Step 2: Create graph from distance matrix
-    graph = Graph(len(coords))
-    for i in range(len(coords)):
-        for j in range(len(coords)):
-            if i != j:
-                graph.add_edge(i, j, distance_matrix[i][j])
-    
+    # Step 2: The distance matrix is the complete graph, so Prim runs on it directly
     # Step 3: Generate MST using Prim's algorithm
     print("Generating MST using Prim's algorithm...")
-    mst_edges = prim_mst(graph)
+    mst_edges = prim_mst_dense(distance_matrix)
     
     # Step 4: DFS traversal to get visiting order
     print("Performing DFS traversal...")
     visiting_order = dfs_traversal(mst_edges, 0)
     
-    # Step 5: Calculate total distance using Dijkstra for each segment
-    print("Computing path distances...")
-    total_distance = 0
-    route_coords = []
+    # Step 4b: For typical small inputs, shorten the MST tour with 2-opt
+    if len(visiting_order) <= TWO_OPT_MAX_STOPS:
+        print("Refining visiting order with 2-opt...")
+        visiting_order = two_opt(visiting_order, distance_matrix)
     
-    for i in range(len(visiting_order)):
-        current = visiting_order[i]
-        route_coords.append(coords[current])
-        
-        if i < len(visiting_order) - 1:
-            next_node = visiting_order[i + 1]
-            _, dist = dijkstra(graph, current, next_node)
-            total_distance += dist
+    # Step 5: Calculate total distance; consecutive stops are adjacent in
+    # the complete graph, so each leg is read straight from the matrix
+    print("Computing path distances...")
+    order = np.asarray(visiting_order)
+    route_coords = pts[order]
+    total_distance = float(distance_matrix[order[:-1], order[1:]].sum())
     
     # Step 6: Get real road geometries using OSRM
     print("Fetching road geometries...")
-    road_segments = []
+    segment_pairs = [
+        (*coords[visiting_order[i]], *coords[visiting_order[i + 1]])
+        for i in range(len(visiting_order) - 1)
+    ]
     
-    for i in range(len(visiting_order) - 1):
-        current_idx = visiting_order[i]
-        next_idx = visiting_order[i + 1]
-        
-        lat1, lon1 = coords[current_idx]
-        lat2, lon2 = coords[next_idx]
-        
-        # Get OSRM route geometry for this segment
-        segment_geometry = get_route_geometry_osrm(lat1, lon1, lat2, lon2)
-        road_segments.append(segment_geometry)
+    # Segments are independent, so fetch them concurrently
+    with ThreadPoolExecutor(max_workers=OSRM_MAX_WORKERS) as executor:
+        road_segments = list(executor.map(lambda p: get_route_geometry_osrm(*p), segment_pairs))
     
     return {
         "visiting_order": visiting_order,
@@ -294,6 +709,14 @@ def plan_route(coords: List[List[float]]) -> Dict:
     }
 
 
+def ojson(data: Dict):
+    """Serialize data to a compact JSON response with orjson (NumPy arrays allowed)."""
+    return app.response_class(
+        orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY),
+        mimetype="application/json"
+    )
+
+
 @app.route("/")
 def index():
     """Serve the main HTML page."""
@@ -306,32 +729,46 @@ def plan_route_endpoint():
     Backend endpoint for route planning.
     Expects: {"coordinates": [[lat1, lon1], [lat2, lon2], ...]}
     Returns: {"visiting_order": [...], "route_coords": [...], "total_distance": ...}
+    where visiting_order holds input indices and route_coords[k] == coordinates[visiting_order[k]].
     """
     try:
         data = request.get_json()
         coords = data.get("coordinates", [])
         
         if len(coords) < 2:
-            return jsonify({
+            return ojson({
                 "error": "Please select at least 2 tourist spots",
                 "visiting_order": [0],
                 "route_coords": coords[:1] if coords else [],
                 "total_distance": 0
             }), 400
         
+        # Duplicate spots would only inflate the distance matrix
+        try:
+            unique_coords, groups = dedupe_coords(coords)
+        except ValueError as e:
+            return ojson({
+                "error": str(e),
+                "success": False
+            }), 400
+        
         # Plan route using the core algorithms
-        result = plan_route(coords)
+        result = plan_route(unique_coords)
+        
+        # Map the order back to input indices, duplicates next to their first occurrence
+        visiting_order = [i for k in result["visiting_order"] for i in groups[k]]
+        route_coords = [coords[i] for i in visiting_order]
         
-        return jsonify({
+        return ojson({
             "success": True,
-            "visiting_order": result["visiting_order"],
-            "route_coords": result["route_coords"],
+            "visiting_order": visiting_order,
+            "route_coords": route_coords,
             "total_distance": result["total_distance"],
             "road_segments": result.get("road_segments", [])
         })
     
     except Exception as e:
-        return jsonify({
+        return ojson({
             "error": str(e),
             "success": False
         }), 500
@@ -339,4 +776,5 @@ def plan_route_endpoint():
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))
-    app.run(host="0.0.0.0", port=port, debug=True)
+    # Development server only; production runs under gunicorn (see Procfile)
+    app.run(host="0.0.0.0", port=port, debug=os.environ.get("FLASK_DEBUG") == "1")
@@ -0,0 +1,16 @@
+"""
+WSGI entry point for gunicorn.
+Run with: gunicorn -w 4 -k gthread --threads 8 --preload wsgi:app
+"""
+from app import app, CACHE, haversine_matrix, prim_mst_dense, two_opt
+
+# Compile the Numba kernels once in the master process so that --preload
+# workers inherit them instead of compiling on their first request.
+# Only serial kernels may run here: Numba's parallel threading layers
+# (OpenMP in particular) are not safe to use across fork()
+_warmup_matrix = haversine_matrix([[0.0, 0.0], [0.0, 1.0], [1.0, 1.0]])
+prim_mst_dense(_warmup_matrix)
+two_opt([0, 1, 2], _warmup_matrix)
+
+# Drop SQLite connections opened during import; each worker reopens its own
+CACHE.close()